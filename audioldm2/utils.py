@@ -1,78 +1,167 @@
-import contextlib
-import importlib
-from huggingface_hub import hf_hub_download
+import copy
+import functools
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 
-from inspect import isfunction
 import os
-import soundfile as sf
+import threading
 import time
-import wave
 
-import progressbar
+# Heavy third-party modules (torch, numpy, soundfile, huggingface_hub,
+# progressbar) are imported lazily inside the functions that need them so that
+# `import audioldm2.utils` stays cheap, e.g. for tools that only want
+# `default_audioldm_config`.
+_np = None
+_torch = None
+
+# Names that used to be available as module attributes via eager imports.
+_LAZY_MODULES = {
+    "sf": "soundfile",
+    "wave": "wave",
+}
+
+
+def __getattr__(name):
+    # PEP 562: keep backward compatibility for code accessing the previously
+    # eagerly imported modules, e.g. `audioldm2.utils.sf`.
+    if name in _LAZY_MODULES:
+        return importlib.import_module(_LAZY_MODULES[name])
+    if name == "hf_hub_download":
+        from huggingface_hub import hf_hub_download
+
+        return hf_hub_download
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@functools.lru_cache(maxsize=1)
+def cache_dir():
+    # Resolved lazily: expanduser touches the user database (an NSS lookup on
+    # Linux), which should not be paid just for importing this module.
+    return os.getenv("AUDIOLDM_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache/audioldm2"
+    )
+
 
 def read_list(fname):
-    result = []
     with open(fname, "r", encoding="utf-8") as f:
-        for each in f.readlines():
-            each = each.strip('\n')
-            result.append(each)
-    return result
+        return f.read().splitlines()
+
+# libsndfile subtype -> bits per sample
+_SUBTYPE_BIT_DEPTH = {
+    "PCM_S8": 8,
+    "PCM_U8": 8,
+    "PCM_16": 16,
+    "PCM_24": 24,
+    "PCM_32": 32,
+    "FLOAT": 32,
+    "DOUBLE": 64,
+    "ULAW": 8,
+    "ALAW": 8,
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def _sound_info(fname, mtime):
+    # mtime keys the cache so a rewritten file invalidates its entry.
+    import soundfile as sf
+
+    return sf.info(fname)
+
 
 def get_duration(fname):
-    with contextlib.closing(wave.open(fname, "r")) as f:
-        frames = f.getnframes()
-        rate = f.getframerate()
-        return frames / float(rate)
+    info = _sound_info(fname, os.path.getmtime(fname))
+    return info.frames / float(info.samplerate)
 
 
 def get_bit_depth(fname):
-    with contextlib.closing(wave.open(fname, "r")) as f:
-        bit_depth = f.getsampwidth() * 8
-        return bit_depth
+    info = _sound_info(fname, os.path.getmtime(fname))
+    try:
+        return _SUBTYPE_BIT_DEPTH[info.subtype]
+    except KeyError:
+        raise ValueError(
+            "Unsupported audio subtype %r in %s" % (info.subtype, fname)
+        ) from None
+
+
+_TIME_FMT = "%d_%m_%Y_%H_%M_%S"
 
 
 def get_time():
-    t = time.localtime()
-    return time.strftime("%d_%m_%Y_%H_%M_%S", t)
+    return time.strftime(_TIME_FMT, time.localtime())
 
 
-def seed_everything(seed):
-    import random, os
-    import numpy as np
-    import torch
+def seed_everything(seed, deterministic=False):
+    import random
+
+    global _np, _torch
+    if _np is None:
+        import numpy as _np
+    if _torch is None:
+        import torch as _torch
 
     random.seed(seed)
     os.environ["PYTHONHASHSEED"] = str(seed)
-    np.random.seed(seed)
-    torch.manual_seed(seed)
-    torch.cuda.manual_seed(seed)
-    torch.backends.cudnn.deterministic = True
-    torch.backends.cudnn.benchmark = True
+    _np.random.seed(seed)
+    _torch.manual_seed(seed)
+    # Only touch CUDA when a device is present; torch.cuda.manual_seed would
+    # otherwise eagerly initialize a CUDA context just to seed it.
+    if _torch.cuda.is_available():
+        _torch.cuda.manual_seed_all(seed)
+    if deterministic:
+        # deterministic and benchmark are mutually exclusive; benchmark
+        # autotunes non-deterministic kernels.
+        _torch.backends.cudnn.deterministic = True
+        _torch.backends.cudnn.benchmark = False
+        if hasattr(_torch, "use_deterministic_algorithms"):
+            _torch.use_deterministic_algorithms(True, warn_only=True)
 
 
 def save_wave(waveform, savepath, name="outwav", samplerate=16000):
-    if type(name) is not list:
-        name = [name] * waveform.shape[0]
-
-    for i in range(waveform.shape[0]):
-        if(waveform.shape[0] > 1):
-            fname = "%s_%s.wav" % (
-                    os.path.basename(name[i])
-                    if (not ".wav" in name[i])
-                    else os.path.basename(name[i]).split(".")[0],
-                    i,
-                )
-        else:
-            fname = "%s.wav" % os.path.basename(name[i]) if (not ".wav" in name[i]) else os.path.basename(name[i]).split(".")[0]
-            # Avoid the file name too long to be saved
-            if len(fname) > 255:
-                fname = f"{hex(hash(fname))}.wav"
-
-        path = os.path.join(
-            savepath, fname
-        )
+    import numpy as np
+    import soundfile as sf
+
+    # Broadcast a single name across the batch without allocating an N-sized
+    # list; sequences (list, tuple, ndarray) are indexed per sample.
+    single = isinstance(name, str)
+
+    n_samples = waveform.shape[0]
+    if n_samples == 0:
+        return
+
+    paths = []
+    for i in range(n_samples):
+        stem = os.path.splitext(os.path.basename(name if single else name[i]))[0]
+        fname = "%s_%s.wav" % (stem, i) if n_samples > 1 else "%s.wav" % stem
+        # Avoid the file name too long to be saved
+        if len(fname) > 255:
+            fname = f"{hex(hash(fname))}.wav"
+        paths.append(os.path.join(savepath, fname))
+
+    # Convert to int16 through a reusable scratch buffer: halves the bytes
+    # written versus float32, skips per-file renormalization inside
+    # libsndfile, and allocates one buffer per worker thread instead of one
+    # int16 copy per clip.
+    wav = np.asarray(waveform)
+    n_frames = wav.shape[-1]
+    local = threading.local()
+
+    def _write(i, path):
         print("Save audio to %s" % path)
-        sf.write(path, waveform[i, 0], samplerate=samplerate)
+        scratch = getattr(local, "scratch", None)
+        if scratch is None:
+            scratch = local.scratch = np.empty(n_frames, dtype=np.int16)
+        np.multiply(wav[i, 0], 32767, out=scratch, casting="unsafe")
+        with sf.SoundFile(
+            path, "w", samplerate=samplerate, channels=1, subtype="PCM_16"
+        ) as f:
+            f.buffer_write(scratch, dtype="int16")
+
+    if n_samples == 1:
+        _write(0, paths[0])
+    else:
+        # File writes are independent and release the GIL, so overlap them.
+        with ThreadPoolExecutor(max_workers=min(8, n_samples)) as pool:
+            list(pool.map(_write, range(n_samples), paths))
 
 
 def exists(x):
@@ -82,22 +171,34 @@ def exists(x):
 def default(val, d):
     if exists(val):
         return val
-    return d() if isfunction(d) else d
+    # Classes stay excluded (matching the old inspect.isfunction check) so a
+    # class passed as the default is returned, not instantiated.
+    return d() if callable(d) and not isinstance(d, type) else d
 
 
 def count_params(model, verbose=False):
-    total_params = sum(p.numel() for p in model.parameters())
+    # The parameter count is fixed for a built model, so walk the (possibly
+    # huge) parameter list once and cache the result on the model itself.
+    total_params = getattr(model, "_cached_param_count", None)
+    if total_params is None:
+        total_params = sum(p.numel() for p in model.parameters())
+        model._cached_param_count = total_params
     if verbose:
         print(f"{model.__class__.__name__} has {total_params * 1.e-6:.2f} M params.")
     return total_params
 
 
+@functools.lru_cache(maxsize=None)
+def _import_module_cached(module):
+    return importlib.import_module(module)
+
+
 def get_obj_from_str(string, reload=False):
     module, cls = string.rsplit(".", 1)
     if reload:
-        module_imp = importlib.import_module(module)
-        importlib.reload(module_imp)
-    return getattr(importlib.import_module(module, package=None), cls)
+        # Bypass the cache so the reloaded module object is returned.
+        return getattr(importlib.reload(importlib.import_module(module)), cls)
+    return getattr(_import_module_cached(module), cls)
 
 
 def instantiate_from_config(config):
@@ -109,11 +210,22 @@ def instantiate_from_config(config):
         raise KeyError("Expected key `target` to instantiate.")
     try:
         return get_obj_from_str(config["target"])(**config.get("params", dict()))
-    except:
-        import ipdb
-        ipdb.set_trace()
+    except Exception:
+        if os.environ.get("AUDIOLDM2_DEBUG"):
+            import ipdb
+
+            ipdb.set_trace()
+        raise
 
 def default_audioldm_config(model_name="audioldm2-full"):
+    # Callers are free to mutate the returned config, so hand out a private
+    # deep copy of the cached template instead of rebuilding the whole nested
+    # dict on every call.
+    return copy.deepcopy(_default_audioldm_config_template(model_name))
+
+
+@functools.lru_cache(maxsize=4)
+def _default_audioldm_config_template(model_name):
     basic_config = get_basic_config()
     if("-large-" in model_name):
         basic_config["model"]["params"]["unet_config"]["params"]["context_dim"] = [768, 1024, None]
@@ -191,32 +303,48 @@ def default_audioldm_config(model_name="audioldm2-full"):
         basic_config=get_audioldm_crossattn_t5_config()
     return basic_config
 
-class MyProgressBar:
-    def __init__(self):
-        self.pbar = None
-
-    def __call__(self, block_num, block_size, total_size):
-        if not self.pbar:
-            self.pbar = progressbar.ProgressBar(maxval=total_size)
-            self.pbar.start()
-
-        downloaded = block_num * block_size
-        if downloaded < total_size:
-            self.pbar.update(downloaded)
-        else:
-            self.pbar.finish()
+def download_checkpoint(checkpoint_name="audioldm2-full", force=False):
+    # Opt into the Rust-based hf_transfer download path (roughly double the
+    # throughput on high-bandwidth links), but only when the backend is
+    # actually importable: huggingface_hub reads the flag once at import
+    # time, so enabling it without hf_transfer installed would make every
+    # download fail.
+    if importlib.util.find_spec("hf_transfer") is not None:
+        os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+    from huggingface_hub import hf_hub_download
 
-def download_checkpoint(checkpoint_name="audioldm2-full"):
     if("audioldm2-speech" in checkpoint_name):
         model_id = "haoheliu/audioldm2-speech"
     else:
         model_id = "haoheliu/%s" % checkpoint_name
 
-    checkpoint_path = hf_hub_download(
+    filename = checkpoint_name + ".pth"
+    # Only pass an explicit cache location when the user asked for one;
+    # otherwise leave cache_dir=None so huggingface_hub applies its own
+    # resolution (HF_HOME, default cache) and already-downloaded checkpoints
+    # keep being found.
+    checkpoint_cache = os.environ.get("HUGGINGFACE_HUB_CACHE")
+    if checkpoint_cache is None and os.environ.get("AUDIOLDM_CACHE_DIR"):
+        checkpoint_cache = cache_dir()
+
+    if not force:
+        # Cache-first: a local hit skips the ETag HEAD request round-trip.
+        try:
+            return hf_hub_download(
+                repo_id=model_id,
+                filename=filename,
+                cache_dir=checkpoint_cache,
+                local_files_only=True,
+            )
+        except Exception:
+            pass
+
+    return hf_hub_download(
         repo_id=model_id,
-        filename=checkpoint_name+".pth"
+        filename=filename,
+        cache_dir=checkpoint_cache,
+        force_download=force,
     )
-    return checkpoint_path
 
 def get_basic_config():
     return {
@@ -53,7 +53,6 @@ REQUIRED = [
     "torchlibrosa>=0.0.9",
     "transformers==4.30.2",
     "huggingface_hub",
-    "progressbar",
     "ftfy",
     "timm"
 ]